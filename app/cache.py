@@ -1,57 +1,137 @@
 # app/cache.py
 import os
 import json
+import heapq
 import asyncio
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from operator import itemgetter
 
 # Используем aiofiles для асинхронного доступа к файлам
 import aiofiles
 
 from .calendar_api import get_upcoming_events
+from .config import CALENDARS
+from .storage import write_json_atomic
 
-# Абсолютный путь к файлу кэша и время жизни кэша (3 минуты)
-CACHE_FILE = "/data/events_cache.json"
+# Шаблон пути к файлу кэша (отдельный файл для каждого календаря) и время жизни кэша (3 минуты)
+CACHE_FILE_TEMPLATE = "/data/events_cache_{name}.json"
 CACHE_TTL = timedelta(minutes=3)
 
-async def get_cached_events():
+# Максимальное количество мероприятий в общей ленте
+MAX_EVENTS = 30
+
+# Часовой пояс, в котором трактуются мероприятия на весь день
+TOMSK_TZ = timezone(timedelta(hours=7))
+
+# Фоновые задачи записи кэша на диск (ответ пользователю не ждёт их завершения)
+_pending_writes = set()
+
+async def _write_cache(name, cache_file, events):
+    try:
+        await asyncio.to_thread(write_json_atomic, cache_file, events)
+        print(f"[{name}] Кэш успешно обновлён.")
+    except Exception as e:
+        print(f"[{name}] Ошибка при обновлении кэша: {e}")
+
+async def _get_calendar_events(name, calendar_id):
     """
-    Возвращает список ближайших мероприятий с использованием файлового кэша.
+    Возвращает список ближайших мероприятий одного календаря с использованием файлового кэша.
     Если файл кэша существует и его возраст меньше CACHE_TTL, данные считываются из него.
     Иначе выполняется новый запрос к Google Calendar и кэш обновляется.
     """
-    print("Запуск функции get_cached_events")  # Лог запуска функции
-
+    cache_file = CACHE_FILE_TEMPLATE.format(name=name)
     try:
         # Проверяем время модификации файла
-        stat_result = await asyncio.get_running_loop().run_in_executor(None, os.stat, CACHE_FILE)
+        stat_result = await asyncio.get_running_loop().run_in_executor(None, os.stat, cache_file)
         file_mod_time = datetime.fromtimestamp(stat_result.st_mtime)
         age = datetime.now() - file_mod_time
-        print(f"Файл кэша найден. Возраст файла: {age}. TTL: {CACHE_TTL}.")
+        print(f"[{name}] Файл кэша найден. Возраст файла: {age}. TTL: {CACHE_TTL}.")
         if age < CACHE_TTL:
             # Файл кэша свежий – читаем данные из него
-            async with aiofiles.open(CACHE_FILE, "r") as f:
+            async with aiofiles.open(cache_file, "r") as f:
                 data = await f.read()
                 try:
                     events = json.loads(data)
-                    print("Данные успешно прочитаны из кэша:", events)
+                    print(f"[{name}] Данные успешно прочитаны из кэша: {len(events)} мероприятий.")
                     return events
                 except json.JSONDecodeError as json_err:
-                    print(f"Ошибка декодирования JSON из кэша: {json_err}")
+                    print(f"[{name}] Ошибка декодирования JSON из кэша: {json_err}")
     except FileNotFoundError:
-        print("Файл кэша не найден.")
+        print(f"[{name}] Файл кэша не найден.")
     except Exception as e:
-        print(f"Ошибка при проверке кэша: {e}")
+        print(f"[{name}] Ошибка при проверке кэша: {e}")
 
     # Если кэш отсутствует или устарел – выполняем запрос к Google Calendar
-    print("Выполнение запроса к Google Calendar...")
-    events = await asyncio.to_thread(get_upcoming_events)
-    print("Полученные события:", events)
-    
-    # Обновляем файл кэша
-    try:
-        async with aiofiles.open(CACHE_FILE, "w") as f:
-            await f.write(json.dumps(events))
-        print("Кэш успешно обновлён.")
-    except Exception as e:
-        print(f"Ошибка при обновлении кэша: {e}")
+    print(f"[{name}] Выполнение запроса к Google Calendar...")
+    events = await asyncio.to_thread(get_upcoming_events, calendar_id)
+    print(f"[{name}] Получено мероприятий: {len(events)}.")
+
+    # Обновляем файл кэша в фоне
+    task = asyncio.create_task(_write_cache(name, cache_file, events))
+    _pending_writes.add(task)
+    task.add_done_callback(_pending_writes.discard)
     return events
+
+def _parse_start(start):
+    """
+    Преобразует поле start (или originalStartTime) мероприятия в datetime с часовым поясом.
+    Возвращает None, если время начала отсутствует или не распознано.
+    """
+    try:
+        if "dateTime" in start:
+            return datetime.fromisoformat(start["dateTime"].replace("Z", "+00:00"))
+        return datetime.strptime(start["date"], "%Y-%m-%d").replace(tzinfo=TOMSK_TZ)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def _with_start(events):
+    """
+    Выдаёт пары (время начала, мероприятие), пропуская мероприятия без корректного
+    времени начала – одна некорректная запись не должна ломать всю ленту.
+    """
+    for event in events:
+        start = _parse_start(event.get("start") or {})
+        if start is None:
+            print(f"Пропущено мероприятие без корректного времени начала: {event.get('id')}")
+            continue
+        yield start, event
+
+def merge_events(event_lists):
+    """
+    Лениво сливает уже отсортированные по времени начала списки мероприятий
+    (k-путевое слияние на куче) в один упорядоченный поток.
+    Мероприятие, присутствующее сразу в нескольких календарях, выдаётся один раз.
+    Экземпляры повторяющегося мероприятия (singleEvents=True) имеют общий iCalUID,
+    поэтому повтором считается только совпадение iCalUID и исходного времени начала.
+    """
+    seen = set()
+    for start, event in heapq.merge(*(_with_start(events) for events in event_lists), key=itemgetter(0)):
+        uid = event.get("iCalUID")
+        if uid is not None:
+            original_start = _parse_start(event.get("originalStartTime") or {}) or start
+            key = (uid, original_start)
+            if key in seen:
+                continue
+            seen.add(key)
+        yield event
+
+async def get_cached_events():
+    """
+    Возвращает общий список ближайших мероприятий всех календарей из CALENDARS.
+    Календари запрашиваются параллельно, поэтому время ответа определяется
+    самым медленным календарём, а не суммой всех запросов.
+    """
+    print("Запуск функции get_cached_events")  # Лог запуска функции
+
+    event_lists = await asyncio.gather(
+        *(_get_calendar_events(name, calendar_id) for name, calendar_id in CALENDARS.items())
+    )
+    return list(islice(merge_events(event_lists), MAX_EVENTS))
+
+async def flush_cache():
+    """
+    Дожидается завершения всех фоновых записей кэша на диск (используется при завершении работы).
+    """
+    if _pending_writes:
+        await asyncio.gather(*list(_pending_writes), return_exceptions=True)
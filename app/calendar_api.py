@@ -1,4 +1,5 @@
 # calendar_api.py
+import threading
 from datetime import datetime, timezone, timedelta
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
@@ -15,15 +16,30 @@ except Exception as e:
     print(f"Ошибка при инициализации Google Calendar API: {e}")
     raise
 
-def get_upcoming_events():
+# Клиент googleapiclient (httplib2) не потокобезопасен, а запросы к разным
+# календарям выполняются параллельно в потоках – у каждого потока свой клиент.
+_local = threading.local()
+_local.service = service
+
+def _get_service():
+    """
+    Возвращает клиент Google Calendar API для текущего потока.
+    """
+    thread_service = getattr(_local, "service", None)
+    if thread_service is None:
+        thread_service = build('calendar', 'v3', credentials=credentials, cache_discovery=False)
+        _local.service = thread_service
+    return thread_service
+
+def get_upcoming_events(calendar_id=CALENDAR_ID):
     """
-    Запрашивает ближайшие 30 мероприятий из календаря.
-    Возвращает список событий или пустой список при ошибке.
+    Запрашивает ближайшие 30 мероприятий из календаря (по умолчанию – основного).
+    Возвращает список событий, отсортированный по времени начала, или пустой список при ошибке.
     """
     try:
         now = datetime.now(timezone.utc).isoformat()
-        events_result = service.events().list(
-            calendarId=CALENDAR_ID,
+        events_result = _get_service().events().list(
+            calendarId=calendar_id,
             timeMin=now,
             maxResults=30,
             singleEvents=True,
@@ -31,7 +47,7 @@ def get_upcoming_events():
         ).execute()
         return events_result.get('items', [])
     except Exception as e:
-        print(f"Ошибка при получении мероприятий: {e}")
+        print(f"Ошибка при получении мероприятий календаря {calendar_id}: {e}")
         return []
 
 def add_event_to_calendar(event_body):
@@ -40,7 +56,7 @@ def add_event_to_calendar(event_body):
     При возникновении ошибки пробрасывает исключение.
     """
     try:
-        return service.events().insert(calendarId=CALENDAR_ID, body=event_body).execute()
+        return _get_service().events().insert(calendarId=CALENDAR_ID, body=event_body).execute()
     except Exception as e:
         print(f"Ошибка при добавлении мероприятия: {e}")
         raise
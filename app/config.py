@@ -16,6 +16,33 @@ except KeyError:
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 SERVICE_ACCOUNT_FILE = 'calendar-of-tomsk-progulka-b7cd9e8caac0.json'
 CALENDAR_ID = 'u972jon1v46k3qed2anvj5mv14@group.calendar.google.com'
+
+# Календари, из которых собирается общая лента мероприятий: имя -> идентификатор.
+# Имя используется в названии файла кэша. Основной календарь (CALENDAR_ID) –
+# единственный, в который добавляются новые мероприятия.
+# Набор можно переопределить переменной окружения CALENDARS в формате
+# «имя=идентификатор,имя=идентификатор».
+CALENDARS = {
+    "progulka": CALENDAR_ID,
+}
+if os.environ.get("CALENDARS"):
+    parsed_calendars = {}
+    for item in os.environ["CALENDARS"].split(","):
+        if "=" not in item:
+            continue
+        name, calendar_id = (part.strip() for part in item.split("=", 1))
+        if not name or not calendar_id:
+            continue
+        # Имя подставляется в путь к файлу кэша, поэтому разделители пути в нём недопустимы.
+        if "/" in name or "\\" in name or name in {".", ".."}:
+            raise ValueError(f"Недопустимое имя календаря в CALENDARS: {name!r}")
+        parsed_calendars[name] = calendar_id
+    if parsed_calendars:
+        CALENDARS = parsed_calendars
+    else:
+        print("Переменная CALENDARS не содержит ни одной пары «имя=идентификатор», "
+              "используется основной календарь.")
+
 WEBHOOK_URL = 'https://kalendar--progulki-baslie.amvera.io/webhook'
 
 ALLOWED_EDITORS = {
@@ -17,6 +17,7 @@ from telegram.ext import (
     ConversationHandler,
     MessageHandler,
     CallbackQueryHandler,
+    TypeHandler,
     filters,
 )
 
@@ -25,6 +26,7 @@ from .calendar_api import get_upcoming_events, add_event_to_calendar
 from .bot import telegram_app
 from .cache import get_cached_events  # используем кэш для мероприятий
 from .usage_stats import log_usage, read_stats
+from .throttle import throttle_guard, suppressed
 
 # Состояния диалога создания мероприятия.
 TITLE, START_TIME, END_TIME, DESCRIPTION, LOCATION, ORGANIZERS, ANNOUNCE, CONFIRMATION = range(8)
@@ -176,6 +178,8 @@ async def statistics_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
                 total_interactions += interactions
                 unique_users += 1
         message += f"\nВсего взаимодействий: {total_interactions}\nУникальных пользователей: {unique_users}"
+        message += (f"\n\nС момента запуска отброшено повторных нажатий: {suppressed['duplicates']}"
+                    f"\nОтброшено сверх лимита запросов: {suppressed['rate_limited']}")
         await update.message.reply_text(message, parse_mode="HTML", reply_markup=get_main_menu_keyboard(user.id))
     except Exception as e:
         await update.message.reply_text(f"Ошибка при получении статистики: {e}", reply_markup=get_main_menu_keyboard(user.id))
@@ -399,6 +403,9 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     return ConversationHandler.END
 
 def setup_handlers():
+    # Фильтр повторов и лимита запросов (group=-1 – срабатывает раньше всех остальных обработчиков)
+    telegram_app.add_handler(TypeHandler(Update, throttle_guard), group=-1)
+
     # Глобальный обработчик для логирования статистики (с group=0 – срабатывает на все обновления)
     telegram_app.add_handler(MessageHandler(filters.ALL, log_usage_handler), group=1)
     
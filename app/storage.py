@@ -0,0 +1,32 @@
+# app/storage.py
+import os
+import json
+import tempfile
+
+def write_json_atomic(path, data):
+    """
+    Атомарно записывает данные в JSON-файл: содержимое сначала пишется во временный
+    файл в том же каталоге, а затем заменяет исходный через os.replace.
+    Прерванная запись не оставляет на диске обрезанный файл.
+    """
+    directory = os.path.dirname(path) or "."
+    # mkstemp создаёт файл с правами 0600 – сохраняем права существующего файла
+    # или используем обычные 0644, чтобы замена не меняла доступ к файлу.
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o644
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,81 @@
+# app/throttle.py
+import time
+
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+
+from .config import BUTTONS
+
+# Окно, в течение которого одинаковые сообщения из одного чата считаются повтором (секунды)
+DUPLICATE_WINDOW = 3.0
+
+# Фильтр применяется только к командам и кнопкам главного меню. Ответы в диалоге
+# создания мероприятия («Да», «Нет», «Пропустить», выбор организаторов) не ограничиваются:
+# они могут законно совпадать подряд и идти быстрой серией.
+GUARDED_BUTTONS = {BUTTONS["UPCOMING"], BUTTONS["ADD_EVENT"], BUTTONS["STATISTICS"]}
+
+# Параметры «ведра токенов» для каждого пользователя:
+# не более RATE_LIMIT_BURST запросов подряд, далее – RATE_LIMIT_PER_SECOND запросов в секунду.
+RATE_LIMIT_BURST = 5
+RATE_LIMIT_PER_SECOND = 0.5
+
+# Размер словарей состояния, после которого из них удаляются устаревшие записи
+PRUNE_THRESHOLD = 1000
+
+# Счётчики отброшенных обновлений. Хранятся только в памяти процесса
+# и обнуляются при каждом перезапуске (в том числе при редеплое).
+suppressed = {"duplicates": 0, "rate_limited": 0}
+
+_last_requests = {}  # (chat_id, текст) -> время последнего принятого сообщения
+_buckets = {}        # user_id -> (доступные токены, время последнего пополнения)
+
+def _is_duplicate(chat_id, text, now):
+    last = _last_requests.get((chat_id, text))
+    return last is not None and now - last < DUPLICATE_WINDOW
+
+def _remember_request(chat_id, text, now):
+    """
+    Открывает окно повторов для пропущенного запроса: отброшенные запросы его не открывают,
+    иначе повторная попытка после ограничения была бы ошибочно засчитана как повтор.
+    """
+    _last_requests[(chat_id, text)] = now
+    if len(_last_requests) > PRUNE_THRESHOLD:
+        for stale_key in [k for k, t in _last_requests.items() if now - t >= DUPLICATE_WINDOW]:
+            del _last_requests[stale_key]
+
+def _take_token(user_id, now):
+    tokens, updated = _buckets.get(user_id, (RATE_LIMIT_BURST, now))
+    tokens = min(RATE_LIMIT_BURST, tokens + (now - updated) * RATE_LIMIT_PER_SECOND)
+    if tokens < 1:
+        _buckets[user_id] = (tokens, now)
+        return False
+    _buckets[user_id] = (tokens - 1, now)
+    if len(_buckets) > PRUNE_THRESHOLD:
+        full_after = RATE_LIMIT_BURST / RATE_LIMIT_PER_SECOND
+        for stale_user in [u for u, (_, t) in _buckets.items() if now - t >= full_after]:
+            del _buckets[stale_user]
+    return True
+
+async def throttle_guard(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Предварительный фильтр обновлений (регистрируется в группе -1).
+    Для команд и кнопок главного меню отбрасывает повторные одинаковые запросы из одного чата
+    в пределах DUPLICATE_WINDOW и запросы сверх лимита пользователя, прерывая обработку
+    до кэша, статистики и отправки ответа. Прочие обновления пропускаются без проверок.
+    """
+    user = update.effective_user
+    message = update.message
+    text = message.text if message is not None else None
+    if user is None or not text or not (text.startswith("/") or text in GUARDED_BUTTONS):
+        return
+    now = time.monotonic()
+
+    if _is_duplicate(message.chat_id, text, now):
+        suppressed["duplicates"] += 1
+        raise ApplicationHandlerStop
+
+    if not _take_token(user.id, now):
+        suppressed["rate_limited"] += 1
+        raise ApplicationHandlerStop
+
+    _remember_request(message.chat_id, text, now)
@@ -1,12 +1,25 @@
 # app/usage_stats.py
-import os
 import json
+import copy
 import asyncio
+import threading
 from datetime import datetime
 
+from .storage import write_json_atomic
+
 # Абсолютный путь к файлу статистики
 STATS_FILE = "/data/usage_stats.json"
 
+# Интервал периодического сохранения статистики на диск (секунды)
+STATS_FLUSH_INTERVAL = 60
+
+# Статистика хранится в памяти: взаимодействия лишь помечают её изменённой, а на диск
+# она сохраняется раз в STATS_FLUSH_INTERVAL и при завершении работы (flush_stats).
+_lock = threading.Lock()        # защищает данные в памяти
+_write_lock = threading.Lock()  # упорядочивает записи файла
+_data = None
+_dirty = False
+
 async def log_usage(user):
     """
     Регистрирует факт взаимодействия пользователя с ботом.
@@ -15,37 +28,65 @@ async def log_usage(user):
     loop = asyncio.get_running_loop()
     await loop.run_in_executor(None, _update_stats, user)
 
+def _load_stats():
+    global _data
+    if _data is None:
+        try:
+            with open(STATS_FILE, "r") as f:
+                _data = json.load(f)
+        except FileNotFoundError:
+            _data = {}
+        except Exception as e:
+            print(f"Ошибка при чтении статистики: {e}")
+            _data = {}
+    return _data
+
 def _update_stats(user):
-    try:
-        with open(STATS_FILE, "r") as f:
-            data = json.load(f)
-    except Exception:
-        data = {}
-
-    uid = str(user.id)
-    today = datetime.now().strftime("%Y-%m-%d")
-    if uid not in data:
-        username = user.username if user.username else f"{user.first_name} {user.last_name}".strip()
-        data[uid] = {"username": username, "interactions": {}}
-    if today not in data[uid]["interactions"]:
-        data[uid]["interactions"][today] = 0
-    data[uid]["interactions"][today] += 1
-
-    try:
-        with open(STATS_FILE, "w") as f:
-            json.dump(data, f)
-    except Exception as e:
-        print(f"Ошибка при сохранении статистики: {e}")
+    global _dirty
+    with _lock:
+        data = _load_stats()
+        uid = str(user.id)
+        today = datetime.now().strftime("%Y-%m-%d")
+        if uid not in data:
+            username = user.username if user.username else f"{user.first_name} {user.last_name}".strip()
+            data[uid] = {"username": username, "interactions": {}}
+        if today not in data[uid]["interactions"]:
+            data[uid]["interactions"][today] = 0
+        data[uid]["interactions"][today] += 1
+        _dirty = True
 
 def read_stats():
     """
-    Синхронно считывает статистику использования из файла.
+    Синхронно возвращает копию статистики использования.
+    """
+    with _lock:
+        return copy.deepcopy(_load_stats())
+
+def flush_stats():
+    """
+    Синхронно сохраняет изменённую статистику на диск.
+    Возвращает False, если сохранить не удалось (данные остаются помеченными как изменённые).
+    """
+    global _dirty
+    with _write_lock:
+        with _lock:
+            if not _dirty:
+                return True
+            snapshot = copy.deepcopy(_data)
+            _dirty = False
+        try:
+            write_json_atomic(STATS_FILE, snapshot)
+            return True
+        except Exception as e:
+            with _lock:
+                _dirty = True
+            print(f"Ошибка при сохранении статистики: {e}")
+            return False
+
+async def periodic_stats_flush():
+    """
+    Фоновая задача: сохраняет статистику на диск раз в STATS_FLUSH_INTERVAL секунд.
     """
-    if not os.path.exists(STATS_FILE):
-        return {}
-    try:
-        with open(STATS_FILE, "r") as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Ошибка при чтении статистики: {e}")
-        return {}
+    while True:
+        await asyncio.sleep(STATS_FLUSH_INTERVAL)
+        await asyncio.to_thread(flush_stats)
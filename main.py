@@ -1,9 +1,92 @@
 # main.py
+import time
+import asyncio
+from datetime import datetime
+import uvicorn
 from fastapi import FastAPI, Request
 from contextlib import asynccontextmanager
 from app.bot import telegram_app
 from app.handlers import setup_handlers
 from app.config import WEBHOOK_URL
+from app.cache import flush_cache
+from app.usage_stats import flush_stats, periodic_stats_flush
+
+# Общий срок завершения работы (секунды): столько uvicorn ждёт открытые запросы вебхука,
+# чтобы каждое принятое обновление было обработано и получило ответ 200 – иначе Telegram
+# доставит его повторно следующему экземпляру. Используется в uvicorn.run (amvera.yml
+# запускает приложение через `python main.py`).
+SHUTDOWN_TIMEOUT = 30
+
+# Короткая страховка после отмены запросов uvicorn по SHUTDOWN_TIMEOUT (секунды)
+FINAL_DRAIN_TIMEOUT = 3
+
+# Задачи, обрабатывающие обновления в данный момент
+_in_flight = set()
+
+# Момент получения сигнала остановки (time.perf_counter), от него отсчитывается общее время
+_shutdown_started = None
+
+_original_handle_exit = uvicorn.Server.handle_exit
+
+def _handle_exit(self, sig, frame):
+    """
+    Отмечает начало остановки: ожидание открытых запросов uvicorn – первый этап завершения работы.
+    """
+    global _shutdown_started
+    if _shutdown_started is None:
+        _shutdown_started = time.perf_counter()
+        print(f"Завершение работы: получен сигнал {sig} в {datetime.now():%H:%M:%S}, "
+              f"ожидание открытых запросов (не дольше {SHUTDOWN_TIMEOUT} с)…")
+    _original_handle_exit(self, sig, frame)
+
+uvicorn.Server.handle_exit = _handle_exit
+
+@asynccontextmanager
+async def _phase(name):
+    """
+    Замеряет и выводит в лог длительность этапа завершения работы.
+    """
+    started = time.perf_counter()
+    print(f"Завершение работы: {name}…")
+    try:
+        yield
+    finally:
+        print(f"Завершение работы: {name} – {time.perf_counter() - started:.2f} с.")
+
+async def _shutdown(stats_flusher):
+    # К этому моменту uvicorn уже закрыл приём соединений и дождался открытых запросов
+    # (не дольше SHUTDOWN_TIMEOUT), так что новые обновления не поступают.
+    started = _shutdown_started if _shutdown_started is not None else time.perf_counter()
+    print(f"Завершение работы: ожидание открытых запросов – {time.perf_counter() - started:.2f} с.")
+
+    # 1. Снимаем вебхук: Telegram будет копить обновления до запуска нового экземпляра.
+    async with _phase("удаление вебхука"):
+        try:
+            await telegram_app.bot.delete_webhook()
+        except Exception as e:
+            print(f"Ошибка при удалении вебхука: {e}")
+
+    # 2. Страховка: обработка обновлений, чьи запросы uvicorn отменил по SHUTDOWN_TIMEOUT,
+    #    продолжается в отдельных задачах – даём ей немного времени завершиться.
+    async with _phase("ожидание обрабатываемых обновлений"):
+        if _in_flight:
+            print(f"Обрабатывается обновлений: {len(_in_flight)}")
+            _, pending = await asyncio.wait(list(_in_flight), timeout=FINAL_DRAIN_TIMEOUT)
+            if pending:
+                print(f"Не завершено за {FINAL_DRAIN_TIMEOUT} с: {len(pending)} обновлений")
+
+    # 3. Сохраняем статистику и кэш на диск.
+    async with _phase("сохранение статистики и кэша"):
+        stats_flusher.cancel()
+        await flush_cache()
+        if not await asyncio.to_thread(flush_stats):
+            print("Статистику сохранить не удалось")
+
+    # 4. Завершаем работу бота.
+    async with _phase("остановка бота"):
+        await telegram_app.shutdown()
+
+    print(f"Завершение работы выполнено за {time.perf_counter() - started:.2f} с.")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -11,10 +94,10 @@ async def lifespan(app: FastAPI):
     await telegram_app.initialize()
     setup_handlers()
     await telegram_app.bot.set_webhook(WEBHOOK_URL)
+    stats_flusher = asyncio.create_task(periodic_stats_flush())
     yield
-    # Shutdown: Удаление вебхука и корректное завершение работы бота.
-    await telegram_app.bot.delete_webhook()
-    await telegram_app.shutdown()
+    # Shutdown: поэтапное завершение работы с ожиданием обрабатываемых обновлений.
+    await _shutdown(stats_flusher)
 
 app = FastAPI(lifespan=lifespan)
 
@@ -23,7 +106,12 @@ async def telegram_webhook(request: Request):
     data = await request.json()
     from telegram import Update
     update = Update.de_json(data, telegram_app.bot)
-    await telegram_app.process_update(update)
+    # Обработка выполняется в отдельной задаче, чтобы разрыв соединения не прерывал её
+    # на середине, а при остановке её можно было дождаться.
+    task = asyncio.create_task(telegram_app.process_update(update))
+    _in_flight.add(task)
+    task.add_done_callback(_in_flight.discard)
+    await asyncio.shield(task)
     return {"ok": True}
 
 @app.get("/")
@@ -31,5 +119,4 @@ async def root():
     return {"message": "Приложение работает"}
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(app, host="0.0.0.0", port=8000, timeout_graceful_shutdown=SHUTDOWN_TIMEOUT)